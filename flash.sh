@@ -7,11 +7,21 @@ FASTBOOT=${FASTBOOT:-fastboot}
 HEIMDALL=${HEIMDALL:-heimdall}
 VARIANT=${VARIANT:-eng}
 
+TOOLS_PATH=
+
+# Sets TOOLS_PATH to our host tools directory, the first time it's needed.
+set_tools_path()
+{
+	: ${TOOLS_PATH:=out/host/`uname -s | tr "[[:upper:]]" "[[:lower:]]"`-x86/bin}
+}
+
 if [ ! -f "`which \"$ADB\"`" ]; then
-	ADB=out/host/`uname -s | tr "[[:upper:]]" "[[:lower:]]"`-x86/bin/adb
+	set_tools_path
+	ADB=$TOOLS_PATH/adb
 fi
 if [ ! -f "`which \"$FASTBOOT\"`" ]; then
-	FASTBOOT=out/host/`uname -s | tr "[[:upper:]]" "[[:lower:]]"`-x86/bin/fastboot
+	set_tools_path
+	FASTBOOT=$TOOLS_PATH/fastboot
 fi
 
 run_adb()
@@ -48,9 +58,11 @@ fastboot_flash_image()
 {
 	# $1 = {userdata,boot,system}
 	imgpath="out/target/product/$DEVICE/$1.img"
-	out="$(run_fastboot flash "$1" "$imgpath" 2>&1)"
-	rv="$?"
-	echo "$out"
+	# Show fastboot's progress as it happens, but keep a copy of the output
+	# so we can look at it if flashing fails. The copy goes to the pipe being
+	# captured into $out (fd 4); reopening stdout by name would truncate it
+	# if it's redirected to a file.
+	{ out="$({ set -o pipefail; run_fastboot flash "$1" "$imgpath" 2>&1 | tee /dev/fd/4 >&3; } 4>&1)"; rv="$?"; } 3>&1
 
 	if [[ "$rv" != "0" ]]; then
 		# Print a nice error message if we understand what went wrong.
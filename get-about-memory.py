@@ -25,24 +25,65 @@ if sys.version_info < (2,7):
     print('This script requires Python 2.7.')
     sys.exit(1)
 
-def shell(cmd, cwd=None):
-    proc = subprocess.Popen(cmd, shell=True, cwd=cwd,
+def popen(cmd, cwd=None):
+    """Start cmd with its output piped back to us.
+
+    cmd is either a string, which is run by the shell, or a list of
+    arguments, which is executed directly without starting a shell.
+
+    """
+    return subprocess.Popen(cmd, shell=isinstance(cmd, str), cwd=cwd,
                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def cmd_str(cmd):
+    return cmd if isinstance(cmd, str) else ' '.join(cmd)
+
+def check_result(cmd, proc, err):
+    """If cmd failed, report why and return a CalledProcessError for it.
+    Otherwise, return None.
+
+    """
+    if not proc.returncode:
+        return None
+    print("Command %s failed with error code %d" % (cmd_str(cmd), proc.returncode), file=sys.stderr)
+    if err:
+        print(err, file=sys.stderr)
+    return subprocess.CalledProcessError(proc.returncode, cmd, err)
+
+def shell(cmd, cwd=None):
+    proc = popen(cmd, cwd=cwd)
     (out, err) = proc.communicate()
-    if proc.returncode:
-        print("Command %s failed with error code %d" % (cmd, proc.returncode), file=sys.stderr)
-        if err:
-            print(err, file=sys.stderr)
-        raise subprocess.CalledProcessError(proc.returncode, cmd, err)
+    failed = check_result(cmd, proc, err)
+    if failed:
+        raise failed
     return out
 
+def shell_parallel(cmds, cwd=None):
+    """Run several independent commands at once and wait for all of them to
+    finish. Each command is either a string or a list of arguments, as for
+    popen().
+
+    Every failure is reported, and the first one is raised once all of the
+    commands have finished.
+
+    """
+    procs = [(cmd, popen(cmd, cwd=cwd)) for cmd in cmds]
+    first_failed = None
+    for (cmd, proc) in procs:
+        (out, err) = proc.communicate()
+        failed = check_result(cmd, proc, err)
+        if not first_failed:
+            first_failed = failed
+    if first_failed:
+        raise first_failed
+
 def get_pids():
     """Get the pids of all gecko processes running on the device.
     
     Returns a tuple (master_pid, child_pids), where child_pids is a list.
     
     """
-    procs = shell("adb shell ps").split('\n')
+    procs = shell(['adb', 'shell', 'ps']).split('\n')
     master_pid = None
     child_pids = []
     for line in procs:
@@ -60,7 +101,7 @@ def get_pids():
 
 def list_files():
     return set(['/data/local/tmp/' + f.strip() for f in
-                shell("adb shell ls '/data/local/tmp'").split('\n')
+                shell(['adb', 'shell', 'ls', "'/data/local/tmp'"]).split('\n')
                 if f.strip().startswith('memory-report-')])
 
 def send_signal(args, pid):
@@ -71,7 +112,7 @@ def send_signal(args, pid):
     # SIGRT0 dumps memory reports, and SIGRT1 first minimizes memory usage and
     # then dumps the reports.
     signal = 'SIGRT0' if not args.minimize_memory_usage else 'SIGRT1'
-    shell("adb shell killer %s %d" % (signal, pid))
+    shell(['adb', 'shell', 'killer', signal, str(pid)])
 
 def choose_output_dir(args):
     if args.output_directory:
@@ -87,6 +128,10 @@ def choose_output_dir(args):
     raise Exception("Couldn't create about-memory output directory.")
 
 def wait_for_all_files(num_expected_files, old_files):
+    """Wait for the device to write out the expected number of memory
+    reporter dumps, and return the set of new files.
+
+    """
     wait_interval = .25
     max_wait = 30
 
@@ -109,7 +154,7 @@ def wait_for_all_files(num_expected_files, old_files):
 
         if len(new_files) == num_expected_files:
             print('')
-            return
+            return new_files
 
         sleep(wait_interval)
 
@@ -120,31 +165,30 @@ def wait_for_all_files(num_expected_files, old_files):
     raise Exception("Missing some about:memory dumps.")
 
 def get_files(args, master_pid, child_pids, old_files):
-    """Get the memory reporter dumps from the device and return the directory
-    we saved them to.
+    """Get the memory reporter dumps from the device and return a tuple
+    (dir, new_files), where dir is the directory we saved them to and
+    new_files is the set of dump files on the device.
 
     """
     num_expected_files = 1 + len(child_pids)
 
-    wait_for_all_files(num_expected_files, old_files)
-    new_files = list_files() - old_files
+    new_files = wait_for_all_files(num_expected_files, old_files)
     dir = choose_output_dir(args)
-    for f in new_files:
-        shell('adb pull %s' % f, cwd=dir)
-        pass
+    shell_parallel([['adb', 'pull', f] for f in new_files], cwd=dir)
     print("Pulled files into %s." % dir)
     merge_files(dir, [os.path.basename(f) for f in new_files])
-    return dir
+    return (dir, new_files)
 
 def merge_files(dir, files):
     """Merge the given memory reporter dump files into one giant file."""
     dumps = [json.load(GzipFile(os.path.join(dir, f))) for f in files]
 
     merged_dump = dumps[0]
+    merged_props = set(merged_dump)
     for dump in dumps[1:]:
         # All of the properties other than 'reports' must be identical in all
         # dumps, otherwise we can't merge them.
-        if set(dump.keys()) != set(merged_dump.keys()):
+        if set(dump) != merged_props:
             print("Can't merge dumps because they don't have the "
                   "same set of properties.")
             return
@@ -159,9 +203,11 @@ def merge_files(dir, files):
               GzipFile(os.path.join(dir, 'merged-reports.gz'), 'w'),
               indent=2)
 
-def remove_new_files(old_files):
+def remove_new_files(new_files):
+    # adb shell joins its arguments into one command line for the device's
+    # shell, so device paths are quoted for that shell.
     # Hopefully this command line won't get too long for ADB.
-    shell('adb shell rm %s' % ' '.join(["'%s'" % f for f in list_files() - old_files]))
+    shell(['adb', 'shell', 'rm'] + ["'%s'" % f for f in new_files])
 
 def get_procrank_etc(dir):
     shell('adb shell procrank > procrank', cwd=dir)
@@ -172,9 +218,9 @@ def get_dumps(args):
     (master_pid, child_pids) = get_pids()
     old_files = list_files()
     send_signal(args, master_pid)
-    dir = get_files(args, master_pid, child_pids, old_files)
+    (dir, new_files) = get_files(args, master_pid, child_pids, old_files)
     if args.remove_from_device:
-        remove_new_files(old_files)
+        remove_new_files(new_files)
     get_procrank_etc(dir)
 
 if __name__ == '__main__':
@@ -14,6 +14,38 @@ gSpecialLibs = {
     }
 }
 
+# Settings from the environment.
+gTargetToolsPrefix = os.environ.get("TARGET_TOOLS_PREFIX", "arm-eabi-")
+gGeckoObjdir = os.environ.get("GECKO_OBJDIR", "objdir-gecko")
+gProductOut = os.environ.get("PRODUCT_OUT", "out/target/product")
+
+# Maps (dir, exclude_dir) to a dictionary of basename -> path (or None, if
+# it isn't in that tree) for each basename we've searched that tree for.
+gTreeIndexes = {}
+
+def FindFilesInTree(dir, basenames, exclude_dir=None):
+  """Search a tree for each of the given basenames and return a dictionary
+     mapping each basename to the first path found for it, or None. The walk
+     stops as soon as every name has been found, and results are cached, so
+     names which were already searched for don't cause another walk."""
+  index = gTreeIndexes.setdefault((dir, exclude_dir), {})
+  remaining = set(basenames).difference(index)
+  if remaining:
+    if not os.path.isdir(dir):
+      print(dir, "isn't a directory");
+      sys.exit(1)
+    for root, dirs, files in os.walk(dir):
+      if exclude_dir in dirs:
+        dirs.remove(exclude_dir)
+      for name in remaining.intersection(files):
+        index[name] = os.path.join(root, name)
+      remaining.difference_update(files)
+      if not remaining:
+        break
+    for name in remaining:
+      index[name] = None
+  return index
+
 ###############################################################################
 #
 # Library class. There is an instance of this for each library in the profile.
@@ -47,11 +79,7 @@ class Library:
     if not self.host_name:
       unknown = "Unknown (in " + self.target_name + ")"
       return [unknown for i in range(len(addresses_strs))]
-    if "TARGET_TOOLS_PREFIX" in os.environ:
-      target_tools_prefix = os.environ["TARGET_TOOLS_PREFIX"]
-    else:
-      target_tools_prefix = "arm-eabi-"
-    args = [target_tools_prefix + "addr2line", "-C", "-f", "-e", self.host_name]
+    args = [gTargetToolsPrefix + "addr2line", "-C", "-f", "-e", self.host_name]
     for address_str in addresses_strs:
       lib_address = int(address_str, 0) - self.start + self.offset
       if self.verbose:
@@ -85,46 +113,26 @@ class Library:
 
   def DumpSymbols(self):
     """Dumps out some information about the symbols in this library."""
-    for address_str in sorted(self.symbols.keys()):
-      print address_str, self.symbols[address_str]
+    # Write out the whole dump at once.
+    sys.stdout.write("".join(["%s %s\n" % (address_str, self.symbols[address_str])
+                              for address_str in sorted(self.symbols.keys())]))
 
   def FindLibInTree(self, basename, dir, exclude_dir=None):
     """Search a tree for a library and return the first one found"""
-    args = ["find", dir]
-    if exclude_dir:
-      args = args + ["!", "(", "-name", exclude_dir, "-prune", ")"]
-    args = args + ["-name", basename, "-print", "-quit"]
-    fullname = subprocess.check_output(args)
-    if len(fullname) > 0:
-      if fullname[-1] == "\n":
-        return fullname[:-1]
-      return fullname
-    return None
+    return FindFilesInTree(dir, [basename], exclude_dir)[basename]
 
   def Locate(self):
     """Try to determine the local name of a given library"""
+    if self.located:
+      return
     if self.target_name[:7] == "/system":
       basename = os.path.basename(self.target_name)
       # First look for a gecko library. We avoid the dist tree since
       # those are stripped.
-      if "GECKO_OBJDIR" in os.environ:
-        gecko_objdir = os.environ["GECKO_OBJDIR"]
-      else:
-        gecko_objdir = "objdir-gecko"
-      if not os.path.isdir(gecko_objdir):
-        print(gecko_objdir, "isn't a directory");
-        sys.exit(1)
-      lib_name = self.FindLibInTree(basename, gecko_objdir, exclude_dir="dist")
+      lib_name = self.FindLibInTree(basename, gGeckoObjdir, exclude_dir="dist")
       if not lib_name:
         # Probably an android library
-        if "PRODUCT_OUT" in os.environ:
-          product_out = os.environ["PRODUCT_OUT"]
-        else:
-          product_out = "out/target/product"
-        if not os.path.isdir(product_out):
-          print(product_out, "isn't a directory");
-          sys.exit(1)
-        lib_name = self.FindLibInTree(basename, product_out)
+        lib_name = self.FindLibInTree(basename, gProductOut)
       if lib_name:
         self.host_name = lib_name
         if self.verbose:
@@ -184,6 +192,7 @@ class Libraries:
 
   def Dump(self):
     """Dumps out some information about all of the libraries that we're tracking."""
+    self.FindLibs(self.libs)
     for lib in self.libs:
       lib.Dump()
 
@@ -208,8 +217,17 @@ class Libraries:
       self.last_lib = self.AddressToLib(address)
     return self.last_lib
 
+  def FindLibs(self, libs):
+    """Searches for the host copies of several libraries together, so that
+       each tree is walked at most once rather than once per library."""
+    basenames = set([os.path.basename(lib.target_name) for lib in libs
+                     if lib.target_name[:7] == "/system"])
+    found = FindFilesInTree(gGeckoObjdir, basenames, exclude_dir="dist")
+    FindFilesInTree(gProductOut, [name for name in basenames if not found[name]])
+
   def ResolveSymbols(self, progress=True):
     """Tries to convert all of the symbols into symbolic equivalents."""
+    self.FindLibs([lib for lib in self.libs if lib.symbols])
     for lib in self.libs:
       lib.ResolveSymbols(progress=progress)
 
@@ -217,22 +235,24 @@ class Libraries:
     """Scans through the locations and builds a set of unresolved addresses for each library."""
     if progress:
       print "Scanning for unresolved addresses..."
-    last_address = None
+    last_address_str = None
     for thread in self.profile["threads"]:
       samples = thread["samples"]
       for sample in samples:
         frames = sample["frames"]
         for frame in frames:
           address_str = frame["location"]
+          # Quick optimization since lots of times the same address appears
+          # many times in a row. We only need to add each address once, so
+          # compare the strings before bothering to parse them.
+          if address_str == last_address_str:
+            continue
+          last_address_str = address_str
           if address_str[:2] == "0x":
             address = int(address_str, 0)
-            # Quick optimization since lots of times the same address appears
-            # many times in a row. We only need to add each address once.
-            if address != last_address:
-              lib = self.Lookup(address)
-              if lib:
-                lib.AddUnresolvedAddress(address)
-                last_address = address
+            lib = self.Lookup(address)
+            if lib:
+              lib.AddUnresolvedAddress(address)
 
   def SymbolicationTable(self):
     """Create the union of all of the symbols from all of the libraries."""